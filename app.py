@@ -1,21 +1,24 @@
-import os, sqlite3, datetime
+import os, datetime
 from math import ceil
 from flask import Flask, jsonify, request, send_from_directory, Response
 import requests
 from flask_cors import CORS
 
+from tools.db import FTS_TABLE, PAPER_COLS, PAPER_SELECT, connect, fts_match_expr, init_db
+
 app = Flask(__name__, static_folder='.', static_url_path='')
 CORS(app) # Allow frontend to fetch data
 
 DB_PATH = os.path.join("data", "papers.db")
 BREAKDOWN_MAX = {"Novelty": 3, "Impact": 4, "Results": 2, "Access": 1}
 CARDS_PER_PAGE = 15
+# Migrations + FTS build run once per worker at import; False means search uses LIKE
+FTS_ENABLED = init_db(DB_PATH)
 
 # --- Database Logic (Adapted from your Streamlit app) ---
 
 def load_rows(search="", cats=None, only_summarized=False, min_score=0, only_scored=False, sort="newest", page=0):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = connect(DB_PATH)
     
     # Base query
     sql = "FROM papers WHERE 1=1"
@@ -27,20 +30,24 @@ def load_rows(search="", cats=None, only_summarized=False, min_score=0, only_sco
         sql += f" AND reasoning_category IN ({placeholders})"
         params.extend(cats)
 
-    # Search
-    if search:
+    # Search: FTS5 index lookup, LIKE scan only if this SQLite lacks FTS5
+    if search and FTS_ENABLED:
+        match = fts_match_expr(search)
+        if match:
+            sql += f" AND id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)"
+            params.append(match)
+    elif search:
         like = f"%{search}%"
-        # Assuming your DB has these columns, as from your original file
         sql += " AND (title LIKE ? OR abstract LIKE ? OR keywords LIKE ? OR tldr LIKE ? OR summary_md LIKE ?)"
         params.extend([like, like, like, like, like])
 
     # Toggles
     if only_summarized:
-        sql += " AND tldr <> ''"
+        sql += " AND has_tldr = 1"
     if only_scored:
-        sql += " AND COALESCE(excitement_score, 0) > 0"
+        sql += " AND excitement_score > 0"
     if min_score:
-        sql += " AND COALESCE(excitement_score, 0) >= ?"
+        sql += " AND excitement_score >= ?"
         params.append(min_score)
         
     # Always filter out skipped papers (irrelevant ones)
@@ -59,20 +66,12 @@ def load_rows(search="", cats=None, only_summarized=False, min_score=0, only_sco
     # --- Get Paginated Data ---
     order_clause = "date DESC"
     if sort == "score":
-        order_clause = "COALESCE(excitement_score,0) DESC, date DESC"
+        order_clause = "excitement_score DESC, date DESC"
     
     offset = page * CARDS_PER_PAGE
     
     data_sql = f"""
-    SELECT
-      id, COALESCE(arxiv_id, '') AS arxiv_id, title, authors, date,
-      COALESCE(reasoning_category, '') AS reasoning_category,
-      arxiv_link, COALESCE(tldr, '') AS tldr,
-      COALESCE(summary_md, '') AS summary_md,
-      COALESCE(excitement_score, 0) AS excitement_score,
-      COALESCE(excitement_reasoning, '') AS excitement_reasoning,
-      COALESCE(score_breakdown, '') AS score_breakdown,
-      COALESCE(last_scored_at, '') AS last_scored_at
+    {PAPER_SELECT}
     {sql}
     ORDER BY {order_clause}
     LIMIT ? OFFSET ?
@@ -81,7 +80,7 @@ def load_rows(search="", cats=None, only_summarized=False, min_score=0, only_sco
     
     rows = []
     try:
-        rows = [dict(r) for r in conn.execute(data_sql, params).fetchall()]
+        rows = [dict(zip(PAPER_COLS, r)) for r in conn.execute(data_sql, params)]
     except Exception as e:
         print(f"Error fetching paper rows: {e}")
         
@@ -120,13 +119,13 @@ def get_papers():
 @app.route('/api/categories')
 def get_categories():
     # Provide the list of categories for the filter dropdown
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cats_all = []
     try:
         cats_all = [
             r[0] for r in conn.execute(
                 "SELECT DISTINCT reasoning_category FROM papers "
-                "WHERE reasoning_category IS NOT NULL AND reasoning_category <> '' "
+                "WHERE reasoning_category <> '' "
                 "ORDER BY reasoning_category"
             )
         ]
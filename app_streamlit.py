@@ -1,11 +1,13 @@
-import os, sqlite3, datetime
+import os, html, re, time
 from math import ceil
 import streamlit as st
 
+from tools.db import FTS_TABLE, PAPER_COLS, PAPER_SELECT, fts_match_expr, init_db, sqlite3
+
 DB_PATH = os.path.join("data", "papers.db")
+DB_URI = f"file:{DB_PATH}?mode=ro&cache=shared"
 BREAKDOWN_MAX = {"Novelty": 3, "Impact": 4, "Results": 2, "Access": 1}
 CARDS_PER_PAGE = 15
-_CARD_CSS_FLAG = "_card_css"
 
 # --- Quantized score slider + breakdown chips ---
 def _score_color(s: int) -> str:
@@ -18,9 +20,7 @@ def _score_color(s: int) -> str:
     if s >= 3: return "#f97316"
     return "#ef4444"
 
-def inject_slider_css():
-    if not getattr(st.session_state, "_qslider_css", False):
-        st.markdown("""
+SLIDER_CSS = """
 <style>
 .qslider { position: relative; height: 32px; margin-top: 6px; }
 .qslider-track {
@@ -46,25 +46,32 @@ def inject_slider_css():
 }
 .qchip { background:#f3f4f6; color:#374151; padding:2px 8px; border-radius:9999px; margin-right:6px; display:inline-block;}
 </style>
-        """, unsafe_allow_html=True)
-        st.session_state._qslider_css = True
+"""
+
+# Slider markup compiled once; the ten tick marks never change
+SLIDER_TICKS = "<span></span>" * 10
+SLIDER_TMPL = (
+    '<div class="qslider" role="img" aria-label="Score %d out of 10">'
+    '<div class="qslider-track"></div>'
+    '<div class="qslider-fill" style="width:%d%%; background:%s;"></div>'
+    '<div class="qslider-ticks">' + SLIDER_TICKS + '</div>'
+    '<div class="qslider-thumb" style="left: calc(%d%% - 9px); color:%s;"></div>'
+    '</div>'
+    '<div class="qslider-label">%s/10</div>'
+).__mod__
+
+# Streamlit drops any element a rerun does not emit again, so the page injects
+# both stylesheets on every run (they are constants, so this is cheap)
+def inject_slider_css():
+    st.markdown(SLIDER_CSS, unsafe_allow_html=True)
 
 def render_quant_slider(score: int):
     score = max(0, min(10, int(score or 0)))
-    pct = f"{score*10}%"
     color = _score_color(score) if score else "#cbd5e1"
-    inject_slider_css()
-    ticks = "".join("<span></span>" for _ in range(10))
-    html = f"""
-<div class="qslider" role="img" aria-label="Score {score} out of 10">
-  <div class="qslider-track"></div>
-  <div class="qslider-fill" style="width:{pct}; background:{color};"></div>
-  <div class="qslider-ticks">{ticks}</div>
-  <div class="qslider-thumb" style="left: calc({pct} - 9px); color:{color};"></div>
-</div>
-<div class="qslider-label">{score if score else '—'}/10</div>
-"""
-    st.markdown(html, unsafe_allow_html=True)
+    st.markdown(
+        SLIDER_TMPL((score, score * 10, color, score * 10, color, score if score else "—")),
+        unsafe_allow_html=True,
+    )
 
 def parse_breakdown(breakdown: str):
     parts = {}
@@ -75,12 +82,32 @@ def parse_breakdown(breakdown: str):
     return parts
 
 
-def inject_card_css():
-    if getattr(st.session_state, _CARD_CSS_FLAG, False):
-        return
-    st.markdown(
-        """
+CARD_CSS = """
 <style>
+  .card {
+    border:1px solid rgba(148,163,184,.35);
+    border-radius:8px;
+    padding:14px 16px 4px 16px;
+    margin-bottom:12px;
+  }
+  .card-head {
+    display:flex;
+    justify-content:space-between;
+    align-items:flex-start;
+    gap:12px;
+  }
+  .card-title {
+    font-weight:700;
+    margin-bottom:8px;
+  }
+  .card-tldr {
+    border-left:3px solid #94a3b8;
+    padding-left:12px;
+    margin:8px 0;
+  }
+  .card details {
+    margin-bottom:10px;
+  }
   .score-badge {
     display:inline-block;
     padding:2px 8px;
@@ -107,45 +134,134 @@ def inject_card_css():
     margin:6px 0 12px 0;
   }
 </style>
-        """,
-        unsafe_allow_html=True,
-    )
-    st.session_state[_CARD_CSS_FLAG] = True
+"""
+
+def inject_card_css():
+    st.markdown(CARD_CSS, unsafe_allow_html=True)
 
 
-def _format_timestamp(ts: str) -> str:
-    if not ts:
-        return ""
+def _safe_int(v):
     try:
-        dt = datetime.datetime.fromisoformat(ts)
-        return dt.strftime("%Y-%m-%d %H:%M UTC")
-    except ValueError:
-        return ts
-
-@st.cache_data(ttl=3600, show_spinner=False)
-def load_rows(search="", cats=None, only_summarized=False, min_score=0, only_scored=False, sort="newest", limit=200):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-
-    sql = """
-    SELECT
-      id,
-      COALESCE(arxiv_id, '') AS arxiv_id,
-      title,
-      authors,
-      date,
-      COALESCE(reasoning_category, '') AS reasoning_category,
-      arxiv_link,
-      COALESCE(tldr, '')       AS tldr,
-      COALESCE(summary_md, '') AS summary_md,
-      COALESCE(excitement_score, 0) AS excitement_score,
-      COALESCE(excitement_reasoning, '') AS excitement_reasoning,
-      COALESCE(score_breakdown, '') AS score_breakdown,
-      COALESCE(last_scored_at, '') AS last_scored_at
-    FROM papers
-    WHERE 1=1
-    """
-    params = []
+        return int(float(v))
+    except (TypeError, ValueError):
+        return 0
+
+
+def prepare_row(r) -> dict:
+    """Attach the render-ready derived fields; runs inside the cached fetch_page, once per data change."""
+    esc = html.escape
+    score = int(r.get("excitement_score") or 0)
+
+    meta_bits = []
+    if r.get("date"):
+        meta_bits.append(str(r["date"]))
+    if r.get("reasoning_category"):
+        meta_bits.append(r["reasoning_category"])
+    if r.get("authors"):
+        meta_bits.append(r["authors"])
+    r["_meta_html"] = f"<div class='card-meta'>{esc(' '.join(' • '.join(meta_bits).split()))}</div>" if meta_bits else ""
+
+    r["_score_color"] = _score_color(score) if score else "#1f2937"
+    r["_scored_at"] = _format_timestamp(r.get("last_scored_at") or "")
+
+    bd = parse_breakdown(r.get("score_breakdown") or "")
+    parts = []
+    for label in ["Novelty", "Impact", "Results", "Access"]:
+        val = _safe_int(bd.get(label, 0) or 0)
+        max_val = BREAKDOWN_MAX.get(label, 0)
+        parts.append(f"{label} {val}/{max_val}" if max_val else f"{label} {val}")
+    r["_breakdown_parts"] = parts
+    # The card markup only depends on the row, so it is built here once and reused on every rerun
+    r["_card_html"] = render_card_html(r)
+    return r
+
+
+_LINE_BREAKS_RE = re.compile(r"\s*\n\s*")
+
+
+def _esc_lines(text: str) -> str:
+    """Escape LLM text for the one-line card HTML; a blank line would end the markdown HTML block."""
+    return _LINE_BREAKS_RE.sub("<br>", html.escape(text.strip()))
+
+
+def render_card_html(r) -> str:
+    esc = html.escape
+    score = int(r.get("excitement_score") or 0)
+
+    badge_val = f"{score}/10" if score else "—/10"
+    badge_title = f" title='Scored {esc(r['_scored_at'])}'" if r["_scored_at"] else ""
+    parts = [
+        "<div class='card'><div class='card-head'><div>",
+        f"<div class='card-title'><a href='{esc(r['arxiv_link'] or '')}' target='_blank'>{esc(' '.join((r['title'] or '').split()))}</a></div>",
+        r["_meta_html"],
+        f"</div><span class='score-badge' style='border-color:{r['_score_color']}'{badge_title}>{badge_val}</span></div>",
+    ]
+
+    if r.get("tldr"):
+        parts.append(f"<div class='card-tldr'><strong>TLDR:</strong> {_esc_lines(r['tldr'])}</div>")
+
+    if score:
+        chips = "".join(f"<span class='qchip'>{p}</span>" for p in r["_breakdown_parts"])
+        parts.append(
+            "<div class='score-block'>"
+            f"<strong>Score: {score}/10</strong>"
+            f"<div class='score-breakdown-label'>Breakdown: {chips}</div>"
+            "</div>"
+        )
+
+        reasoning = (r.get("excitement_reasoning") or "").strip()
+        if reasoning:
+            if len(reasoning) > 260:
+                parts.append(f"<details><summary>Assessment</summary>{_esc_lines(reasoning)}</details>")
+            else:
+                parts.append(f"<p><strong>Assessment:</strong> {_esc_lines(reasoning)}</p>")
+
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def render_cards_html(rows) -> str:
+    return "".join(r["_card_html"] for r in rows)
+
+
+def _format_timestamp(ts) -> str:
+    if isinstance(ts, int):
+        return time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(ts))
+    return str(ts or "")
+
+@st.cache_resource(show_spinner=False)
+def fts_enabled():
+    """Run tools.db.init_db once per server; False means search uses LIKE."""
+    return init_db(DB_PATH)
+
+@st.cache_resource(show_spinner=False)
+def get_conn():
+    """Long-lived read-only connection shared by every session and rerun."""
+    fts_enabled()
+    conn = sqlite3.connect(DB_URI, uri=True, check_same_thread=False)
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+def data_stamp():
+    """Cheap change marker for the cache keys; moves only when the pipeline writes."""
+    # Separate subqueries so each MAX() is a single index probe rather than one shared scan.
+    # data_version moves on any commit from another connection, including writes that
+    # set no timestamp (e.g. the summarizer marking papers as skipped).
+    return tuple(get_conn().execute(
+        "SELECT (SELECT MAX(id) FROM papers), "
+        "(SELECT MAX(last_summarized_at) FROM papers), "
+        "(SELECT MAX(last_scored_at) FROM papers), "
+        "(SELECT data_version FROM pragma_data_version)"
+    ).fetchone())
+
+def _build_where(filters, params):
+    """WHERE fragment shared by count_rows and fetch_page; appends its bind values to params."""
+    search = filters.get("search", "")
+    cats = filters.get("cats")
+    min_score = filters.get("min_score", 0)
+
+    sql = " WHERE 1=1"
 
     # Category filter
     if cats:
@@ -153,35 +269,81 @@ def load_rows(search="", cats=None, only_summarized=False, min_score=0, only_sco
         sql += f" AND reasoning_category IN ({placeholders})"
         params += list(cats)
 
-    # Search across title/abstract/keywords + tldr/summary
-    if search:
+    # Search across title/abstract/keywords + tldr/summary via the FTS5 index
+    if search and fts_enabled():
+        match = fts_match_expr(search)
+        if match:
+            sql += f" AND id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)"
+            params.append(match)
+    elif search:
+        # Fallback for SQLite builds without FTS5: full scan with LIKE
         like = f"%{search}%"
-        # NOTE: this references 'abstract' and 'keywords' assuming they exist in your table.
-        # If not, remove them from the WHERE below.
         sql += " AND (title LIKE ? OR abstract LIKE ? OR keywords LIKE ? OR tldr LIKE ? OR summary_md LIKE ?)"
         params += [like, like, like, like, like]
 
     # Only items that already have a TL;DR
-    if only_summarized:
-        sql += " AND tldr <> ''"
+    if filters.get("only_summarized"):
+        sql += " AND has_tldr = 1"
 
-    if only_scored:
-        sql += " AND COALESCE(excitement_score, 0) > 0"
+    if filters.get("only_scored"):
+        sql += " AND excitement_score > 0"
 
     if min_score:
-        sql += " AND COALESCE(excitement_score, 0) >= ?"
+        sql += " AND excitement_score >= ?"
         params.append(min_score)
 
-    order_clause = "date DESC"
+    return sql
+
+# `stamp` is never read: it only keys the caches, so entries live until the data changes
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_categories(stamp=None):
+    return [
+        r[0] for r in get_conn().execute(
+            "SELECT DISTINCT reasoning_category FROM papers "
+            "WHERE reasoning_category <> '' "
+            "ORDER BY reasoning_category"
+        )
+    ]
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def count_rows(filters, stamp=None) -> int:
+    """Result total for the pager, answered by SQLite; cached apart from pages so page turns reuse it."""
+    params = []
+    where = _build_where(filters, params)
+    return get_conn().execute(f"SELECT COUNT(*) FROM papers{where}", params).fetchone()[0]
+
+def row_cursor(row, sort="newest"):
+    """Seek key of a row: the ORDER BY columns, used as the cursor for the next page."""
     if sort == "score":
-        order_clause = "COALESCE(excitement_score,0) DESC, date DESC"
+        return (row["excitement_score"], row["date"], row["id"])
+    return (row["date"], row["id"])
 
-    sql += f" ORDER BY {order_clause} LIMIT ?"
-    params.append(limit)
+@st.cache_data(max_entries=256, show_spinner=False)
+def fetch_page(filters, cursor=None, page_size=CARDS_PER_PAGE, sort="newest", stamp=None):
+    params = []
+    where = _build_where(filters, params)
+
+    # Keyset pagination: seek past the previous page's last row instead of OFFSET
+    if cursor:
+        if sort == "score":
+            where += " AND (excitement_score, date, id) < (?, ?, ?)"
+        else:
+            where += " AND (date, id) < (?, ?)"
+        params += list(cursor)
+
+    order_clause = "date DESC, id DESC"
+    if sort == "score":
+        order_clause = "excitement_score DESC, date DESC, id DESC"
+
+    sql = f"""
+    {PAPER_SELECT}
+    FROM papers{where}
+    ORDER BY {order_clause}
+    LIMIT ?
+    """
+    params.append(page_size)
 
-    rows = [dict(r) for r in conn.execute(sql, params).fetchall()]
-    conn.close()
-    return rows
+    return [prepare_row(dict(zip(PAPER_COLS, r))) for r in get_conn().execute(sql, params)]
 
 # ---------- UI ----------
 st.set_page_config(page_title="Reasoning Hub", layout="wide", initial_sidebar_state="collapsed")
@@ -192,19 +354,11 @@ with st.sidebar:
     search = st.text_input("Search")
 
     # Category list (hide blanks)
-    conn = sqlite3.connect(DB_PATH)
-    cats_all = [
-        r[0] for r in conn.execute(
-            "SELECT DISTINCT reasoning_category FROM papers "
-            "WHERE reasoning_category IS NOT NULL AND reasoning_category <> '' "
-            "ORDER BY reasoning_category"
-        )
-    ]
-    conn.close()
+    stamp = data_stamp()
+    cats_all = load_categories(stamp)
 
     sel = st.multiselect("Filter by category", cats_all)
     only_summarized = st.checkbox("Summarized", value=False)
-    limit = st.slider("Max results", min_value=25, max_value=500, value=200, step=25)
 
     min_score = st.slider("Min excitement score", min_value=0, max_value=10, value=0, step=1)
     only_scored = st.checkbox("Only show scored papers", value=False)
@@ -215,129 +369,69 @@ with st.sidebar:
         if st.button("Refresh"):
             st.cache_data.clear()
 
-if "page" not in st.session_state:
-    st.session_state.page = 0
 sort_key = "score" if sort == "Score" else "newest"
-rows = load_rows(
+filters = dict(
     search=search,
-    cats=sel,
+    cats=tuple(sel),
     only_summarized=only_summarized,
     min_score=min_score,
     only_scored=only_scored,
-    sort=sort_key,
-    limit=limit,
 )
-current_signature = (search, tuple(sel), only_summarized, min_score, only_scored, sort_key, limit)
+current_signature = (search, tuple(sel), only_summarized, min_score, only_scored, sort_key)
 if st.session_state.get("_last_filter_signature") != current_signature:
-    st.session_state.page = 0
+    st.session_state.cursor = None
+    st.session_state.prev_cursors = []
     st.session_state._last_filter_signature = current_signature
 
-total_pages = max(1, ceil(len(rows) / CARDS_PER_PAGE)) if rows else 1
-st.session_state.page = max(0, min(st.session_state.page, total_pages - 1))
-start = st.session_state.page * CARDS_PER_PAGE
-end = start + CARDS_PER_PAGE
-page_rows = rows[start:end]
+total_count = count_rows(filters, stamp=stamp)
+total_pages = max(1, ceil(total_count / CARDS_PER_PAGE))
+page_rows = fetch_page(filters, st.session_state.cursor, sort=sort_key, stamp=stamp)
+page_idx = len(st.session_state.prev_cursors)
+st.session_state.next_cursor = row_cursor(page_rows[-1], sort_key) if page_rows else None
 
-st.caption(f"{len(rows)} results")
-if rows:
+st.caption(f"{total_count} results")
+if total_count:
     col1, col2, col3 = st.columns([1, 13, 1])
     with col1:
-        disabled = st.session_state.page <= 0
+        disabled = page_idx <= 0
         if st.button("◀ Prev", key="prev_page", disabled=disabled):
-            st.session_state.page -= 1
+            st.session_state.cursor = st.session_state.prev_cursors.pop()
             st.rerun()
     with col3:
-        disabled = st.session_state.page >= total_pages - 1
+        disabled = page_idx >= total_pages - 1 or len(page_rows) < CARDS_PER_PAGE
         if st.button("Next ▶", key="next_page", disabled=disabled):
-            st.session_state.page += 1
+            st.session_state.prev_cursors.append(st.session_state.cursor)
+            st.session_state.cursor = st.session_state.next_cursor
             st.rerun()
     with col2:
         st.markdown(
-            f"<div style='text-align:center;'>Page {st.session_state.page + 1} / {total_pages}</div>",
+            f"<div style='text-align:center;'>Page {page_idx + 1} / {total_pages}</div>",
             unsafe_allow_html=True,
         )
 
-if not rows:
+if not page_rows:
     st.info("No results. Try clearing filters or broaden your search.")
 else:
+    inject_slider_css()
+    inject_card_css()
+    # Cards are plain HTML emitted in as few markdown calls as possible; the only
+    # widgets are the per-card summary toggles, and the summary itself is built
+    # only for the cards whose toggle is on.
+    pending = []
     for r in page_rows:
-        with st.container(border=True):
-            inject_card_css()
-            score = int(r.get("excitement_score") or 0)
-
-            head_l, head_r = st.columns([0.82, 0.18], gap="small")
-            with head_l:
-                st.markdown(f"**[{r['title']}]({r['arxiv_link']})**")
-
-                meta_bits = []
-                if r.get("date"):
-                    meta_bits.append(str(r["date"]))
-                if r.get("reasoning_category"):
-                    meta_bits.append(r["reasoning_category"])
-                if r.get("authors"):
-                    meta_bits.append(r["authors"])
-                if meta_bits:
+        pending.append(r)
+        if not (r.get("excitement_score") and r.get("summary_md")):
+            continue
+        st.markdown(render_cards_html(pending), unsafe_allow_html=True)
+        pending = []
+        if st.toggle("View full summary", key=f"view_{r['id']}"):
+            with st.expander("Show full summary", expanded=True):
+                st.markdown(r["summary_md"])
+                arxiv_id = (r.get("arxiv_id") or "").strip()
+                if arxiv_id and st.button("Load PDF", key=f"load_pdf_{r['id']}"):
                     st.markdown(
-                        f"<div class='card-meta'>{' • '.join(meta_bits)}</div>",
+                        f'<iframe src="https://arxiv.org/pdf/{arxiv_id}" width="100%" height="600"></iframe>',
                         unsafe_allow_html=True,
                     )
-
-            with head_r:
-                badge_val = f"{score}/10" if score else "—/10"
-                st.markdown(
-                    f"<div style='text-align:right'><span class='score-badge'>{badge_val}</span></div>",
-                    unsafe_allow_html=True,
-                )
-
-            if r.get("tldr"):
-                st.markdown(f"> **TLDR:** {r['tldr']}")
-
-            # Title + link
-            if score:
-                bd = parse_breakdown(r.get("score_breakdown") or "")
-                labels = ["Novelty", "Impact", "Results", "Access"]
-
-                def _safe_int(v):
-                    try:
-                        return int(float(v))
-                    except (TypeError, ValueError):
-                        return 0
-
-                segment_bits = []
-                for label in labels:
-                    val = _safe_int(bd.get(label, 0) or 0)
-                    max_val = BREAKDOWN_MAX.get(label, 0)
-                    if max_val:
-                        segment_bits.append(f"{label} {val}/{max_val}")
-                    else:
-                        segment_bits.append(f"{label} {val}")
-                st.markdown(
-                    "<div class='score-block'>"
-                    f"<strong>Score: {score}/10</strong>"
-                    f"<div class='score-breakdown-label'>Breakdown: {' | '.join(segment_bits)}</div>"
-                    "</div>",
-                    unsafe_allow_html=True,
-                )
-                # tiny spacer between breakdown row and the assessment/expander
-                st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
-
-                reasoning = (r.get("excitement_reasoning") or "").strip()
-                if reasoning:
-                    if len(reasoning) > 260:
-                        with st.expander("Assessment"):
-                            st.markdown(reasoning)
-                    else:
-                        st.markdown(f"**Assessment:** {reasoning}")
-
-                # Removed fallback caption for no excitement score timestamp
-
-                # Full Markdown summary (expander)
-                if r.get("summary_md"):
-                    with st.expander("Show full summary"):
-                        st.markdown(r["summary_md"])
-                        arxiv_id = (r.get("arxiv_id") or "").strip()
-                        if arxiv_id and st.button("Load PDF", key=f"load_pdf_{r['id']}"):
-                            st.markdown(
-                                f'<iframe src="https://arxiv.org/pdf/{arxiv_id}" width="100%" height="600"></iframe>',
-                                unsafe_allow_html=True,
-                            )
\ No newline at end of file
+    if pending:
+        st.markdown(render_cards_html(pending), unsafe_allow_html=True)
@@ -1,10 +1,18 @@
 print("Debug: Script is starting...")
 
 import os
-import sqlite3
+import time
 from datetime import datetime
 import requests
 
+from db import connect, ensure_schema, sqlite3
+
+# Optional: stream-parse the HF response instead of loading the whole JSON body
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 print("DEBUG: Imports successful...")
 
 DB_PATH = os.getenv("PROJECTS_DB", "data/papers.db")
@@ -17,54 +25,79 @@ def get_huggingface_papers():
     papers = []
     try:
         url = "https://huggingface.co/api/daily_papers"
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        with requests.get(url, timeout=10, stream=True) as resp:
+            resp.raise_for_status()
+            if ijson is not None:
+                resp.raw.decode_content = True  # let urllib3 undo gzip before ijson reads
+                data = ijson.items(resp.raw, "item")
+            else:
+                data = resp.json()
+
+            for item in data:
+                paper = item.get("paper", {})
+                arxiv_id = paper.get("id", "")
+                if not arxiv_id:
+                    continue
+
+                authors = paper.get("authors", [])
+                author_names = ", ".join(a.get("name", "") for a in authors[:5])
+                if len(authors) > 5:
+                    author_names += ", et al."
+
+                papers.append(
+                    {
+                        "arxiv_id": arxiv_id,
+                        "title": paper.get("title", ""),
+                        "authors": author_names,
+                        "abstract": paper.get("summary", ""),
+                        "url": f"https://arxiv.org/abs/{arxiv_id}",
+                        "published": paper.get("publishedAt", ""),
+                    }
+                )
     except Exception as exc:
         print(f"❌ HuggingFace fetch failed: {exc}")
         return papers
 
-    for item in data:
-        paper = item.get("paper", {})
-        arxiv_id = paper.get("id", "")
-        if not arxiv_id:
-            continue
-
-        authors = paper.get("authors", [])
-        author_names = ", ".join(a.get("name", "") for a in authors[:5])
-        if len(authors) > 5:
-            author_names += ", et al."
-
-        papers.append(
-            {
-                "arxiv_id": arxiv_id,
-                "title": paper.get("title", ""),
-                "authors": author_names,
-                "abstract": paper.get("summary", ""),
-                "url": f"https://arxiv.org/abs/{arxiv_id}",
-                "published": paper.get("publishedAt", ""),
-            }
-        )
-
     print(f"✓ Found {len(papers)} papers from HuggingFace Daily Papers")
     return papers
 
 
-def paper_exists(conn, arxiv_id):
-    """Check if paper already in database"""
+def existing_arxiv_ids(conn, arxiv_ids):
+    """Return the subset of arxiv_ids already in the database (one indexed lookup)"""
+    if not arxiv_ids:
+        return set()
+    placeholders = ",".join("?" for _ in arxiv_ids)
     cur = conn.execute(
-        "SELECT COUNT(*) FROM papers WHERE arxiv_link LIKE ?",
-        (f"%{arxiv_id}%",),
+        f"SELECT arxiv_id FROM papers WHERE arxiv_id IN ({placeholders})",
+        list(arxiv_ids),
     )
-    return cur.fetchone()[0] > 0
-
-
-def add_paper_to_db(conn, paper):
-    """Insert new paper into database"""
+    return {row[0] for row in cur.fetchall()}
+
+
+def add_papers_to_db(conn, papers):
+    """Insert new papers in a single transaction; returns the number inserted"""
+    now = datetime.now()
+    note = f"Auto-collected from HF on {now.strftime('%Y-%m-%d')}"
+    rows = [
+        (
+            paper["arxiv_id"],
+            paper["title"],
+            paper["authors"],
+            paper["published"],
+            paper["abstract"],
+            paper["url"],
+            "huggingface",
+            "",
+            note,
+            int(time.time()),
+        )
+        for paper in papers
+    ]
     try:
-        conn.execute(
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.executemany(
             """
-            INSERT INTO papers (
+            INSERT OR IGNORE INTO papers (
                 arxiv_id,
                 title,
                 authors,
@@ -78,24 +111,14 @@ def add_paper_to_db(conn, paper):
             )
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (
-                paper["arxiv_id"],
-                paper["title"],
-                paper["authors"],
-                paper["published"],
-                paper["abstract"],
-                paper["url"],
-                "huggingface",
-                "",
-                f"Auto-collected from HF on {datetime.now().strftime('%Y-%m-%d')}",
-                datetime.now().isoformat(),
-            ),
+            rows,
         )
         conn.commit()
-        return True
+        return cur.rowcount
     except Exception as exc:
-        print(f"⚠️  Failed to add paper: {exc}")
-        return False
+        conn.rollback()
+        print(f"⚠️  Failed to add papers: {exc}")
+        return 0
 
 
 def main():
@@ -111,7 +134,7 @@ def main():
         print("❌ No papers found. Exiting.", flush=True)
         return
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     
     # Ensure table exists
     conn.execute("""
@@ -123,47 +146,52 @@ def main():
             date TEXT,
             abstract TEXT,
             arxiv_link TEXT,
-            reasoning_category TEXT,
+            reasoning_category TEXT NOT NULL DEFAULT '',
             keywords TEXT,
             notes TEXT,
-            summary_md TEXT,
-            tldr TEXT,
-            excitement_score INTEGER,
+            summary_md TEXT NOT NULL DEFAULT '',
+            tldr TEXT NOT NULL DEFAULT '',
+            excitement_score INTEGER NOT NULL DEFAULT 0,
             raw_excitement_score INTEGER,
             excitement_reasoning TEXT,
             score_breakdown TEXT,
-            last_scored_at TEXT,
+            last_scored_at INTEGER,
             model_used TEXT,
             summary_tokens INTEGER,
-            last_summarized_at TEXT,
-            date_added TEXT
+            last_summarized_at INTEGER,
+            date_added INTEGER
         )
     """)
     conn.commit()
 
     # Ensure date_added column exists
     try:
-        conn.execute("ALTER TABLE papers ADD COLUMN IF NOT EXISTS date_added TEXT")
+        conn.execute("ALTER TABLE papers ADD COLUMN IF NOT EXISTS date_added INTEGER")
         conn.commit()
     except sqlite3.OperationalError:
         cur = conn.execute("PRAGMA table_info(papers)")
         columns = {row[1] for row in cur.fetchall()}
         if "date_added" not in columns:
-            conn.execute("ALTER TABLE papers ADD COLUMN date_added TEXT")
+            conn.execute("ALTER TABLE papers ADD COLUMN date_added INTEGER")
             conn.commit()
 
-    new_count = 0
+    ensure_schema(conn)
+
     skipped_count = 0
+    existing = existing_arxiv_ids(conn, {paper["arxiv_id"] for paper in papers})
+    new_papers = []
 
     for paper in papers:
-        if paper_exists(conn, paper["arxiv_id"]):
+        if paper["arxiv_id"] in existing:
             skipped_count += 1
             print(f"⏭  Skipped duplicate: {paper['title'][:40]}...", flush=True)
             continue
+        new_papers.append(paper)
 
-        if add_paper_to_db(conn, paper):
-            new_count += 1
-            print(f"✓ Added: {paper['title'][:60]}...", flush=True)
+    # INSERT OR IGNORE may drop rows another run added meanwhile, so only the count is reliable
+    new_count = add_papers_to_db(conn, new_papers) if new_papers else 0
+    if new_count:
+        print(f"✓ Added {new_count} of {len(new_papers)} new paper(s)", flush=True)
 
     conn.close()
 
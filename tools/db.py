@@ -0,0 +1,383 @@
+"""Shared SQLite helpers for the pipeline tools and the web apps."""
+import hashlib
+import json
+import os
+import re
+import time
+
+try:
+    # pysqlite3-binary ships a current SQLite amalgamation with FTS5 and JSON1
+    # compiled in; fall back to the stdlib build where it isn't installed
+    import pysqlite3 as sqlite3
+except ImportError:
+    import sqlite3
+
+FTS_TABLE = "papers_fts"
+FTS_COLUMNS = ("title", "abstract", "keywords", "tldr", "summary_md")
+
+# WAL lets the web readers run alongside the summarizer/scorer writers;
+# 64 MB page cache + 256 MB mmap keep the papers table hot.
+CONNECT_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+PRAGMA mmap_size=268435456;
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the papers DB in autocommit mode with WAL and tuned pragmas."""
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.executescript(CONNECT_PRAGMAS)
+    return conn
+
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,),
+    ).fetchone()
+    return row is not None
+
+
+def fts_available(conn: sqlite3.Connection) -> bool:
+    return table_exists(conn, FTS_TABLE)
+
+
+def compile_option_used(conn: sqlite3.Connection, option: str) -> bool:
+    return bool(conn.execute("SELECT sqlite_compileoption_used(?)", (option,)).fetchone()[0])
+
+
+def _ensure_fts_triggers(conn: sqlite3.Connection) -> None:
+    cols = ", ".join(FTS_COLUMNS)
+    new_vals = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_vals = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS papers_fts_ai AFTER INSERT ON papers BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_vals});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS papers_fts_ad AFTER DELETE ON papers BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS papers_fts_au AFTER UPDATE OF {cols} ON papers BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_vals});
+        END
+    """)
+
+
+def ensure_fts(conn: sqlite3.Connection) -> bool:
+    """
+    One-time migration: build the external-content FTS5 index over papers and
+    install the triggers that keep it in sync. Returns False only if this
+    SQLite build has no FTS5, in which case callers fall back to LIKE search.
+    Runs inside ensure_schema's write transaction.
+    """
+    if not compile_option_used(conn, "ENABLE_FTS5"):
+        print(f"⚠️  SQLite {sqlite3.sqlite_version} was built without FTS5, search will use LIKE "
+              "(pip install pysqlite3-binary)")
+        return False
+    if fts_available(conn):
+        # Triggers are dropped whenever papers is rebuilt, so re-check them
+        _ensure_fts_triggers(conn)
+        return True
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            {", ".join(FTS_COLUMNS)},
+            content='papers',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    _ensure_fts_triggers(conn)
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    print(f"✓ Built {FTS_TABLE} full-text index")
+    return True
+
+
+# C0/C1 control characters; a NUL inside a quoted term is an FTS5 syntax error
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x1f\x7f-\x9f]")
+
+
+def fts_match_expr(search: str) -> str:
+    """Turn free-text user input into an FTS5 MATCH expression of quoted prefix terms."""
+    terms = []
+    for tok in (search or "").split():
+        tok = _CONTROL_CHARS_RE.sub("", tok)
+        if not any(ch.isalnum() for ch in tok):
+            continue
+        terms.append('"' + tok.replace('"', '""') + '"*')
+    return " ".join(terms)
+
+
+def ensure_indexes(conn: sqlite3.Connection) -> None:
+    """Composite indexes that turn the list views' ORDER BY ... LIMIT into index range scans."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_date_id ON papers(date DESC, id DESC)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_papers_score_date_id "
+        "ON papers(excitement_score DESC, date DESC, id DESC)"
+    )
+    # arxiv_id is declared UNIQUE, so its autoindex already serves the collector's duplicate check
+    conn.execute("DROP INDEX IF EXISTS idx_papers_arxiv_id")
+    # MAX() over these is an index lookup; the web UI uses it as a cache stamp
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_last_summarized ON papers(last_summarized_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_last_scored ON papers(last_scored_at)")
+    # Filter predicates: category IN (...) and only_summarized; only_scored is a range
+    # on idx_papers_score_date_id. Superseded indexes are dropped to keep writes cheap.
+    conn.execute("DROP INDEX IF EXISTS idx_papers_category")
+    conn.execute("DROP INDEX IF EXISTS idx_papers_score_date")
+    conn.execute("DROP INDEX IF EXISTS idx_papers_ex_score")  # prefix of idx_papers_score_date_id
+    conn.execute("DROP INDEX IF EXISTS idx_papers_cat_date")  # had id ASC, forcing a sort for date DESC, id DESC
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_papers_cat_date_id "
+        "ON papers(reasoning_category, date DESC, id DESC)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_papers_tldr_date")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_has_tldr_date ON papers(has_tldr, date DESC, id DESC)")
+
+
+# Columns the pipeline, indexes, FTS and generated columns rely on, as declared
+# by the collector's CREATE TABLE; older schemas (backend/setup_db.py) lack them
+BASE_COLUMNS = {
+    "reasoning_category": "TEXT NOT NULL DEFAULT ''",
+    "keywords": "TEXT",
+    "notes": "TEXT",
+    "summary_md": "TEXT NOT NULL DEFAULT ''",
+    "tldr": "TEXT NOT NULL DEFAULT ''",
+    "excitement_score": "INTEGER NOT NULL DEFAULT 0",
+    "raw_excitement_score": "INTEGER",
+    "excitement_reasoning": "TEXT",
+    "score_breakdown": "TEXT",
+    "last_scored_at": "INTEGER",
+    "model_used": "TEXT",
+    "summary_tokens": "INTEGER",
+    "last_summarized_at": "INTEGER",
+    "date_added": "INTEGER",
+}
+
+
+def _ensure_base_columns(conn: sqlite3.Connection) -> None:
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(papers)")}
+    missing = [c for c in BASE_COLUMNS if c not in existing]
+    for col in missing:
+        conn.execute(f"ALTER TABLE papers ADD COLUMN {col} {BASE_COLUMNS[col]}")
+    if missing:
+        print(f"✓ Added missing columns {', '.join(missing)} to papers")
+
+
+# Timestamps are stored as INTEGER unix epochs and formatted only on display
+EPOCH_COLUMNS = ("last_summarized_at", "last_scored_at", "date_added")
+
+
+def _column_types(conn: sqlite3.Connection) -> dict:
+    return {row[1]: (row[2] or "").upper() for row in conn.execute("PRAGMA table_info(papers)")}
+
+
+def _rebuild_papers(conn: sqlite3.Connection, column_defs: dict, select_exprs: dict) -> None:
+    """
+    Recreate papers with edited column definitions and copy the rows over
+    (SQLite's ALTER TABLE cannot change a column's type or constraints).
+    column_defs maps column -> new definition; select_exprs maps column ->
+    SQL expression used to convert the old value while copying. Must run
+    inside ensure_schema's write transaction, after pending work was computed.
+    """
+    create_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'papers'"
+    ).fetchone()[0]
+    for col, definition in column_defs.items():
+        create_sql, n = re.subn(
+            rf"\b{col}\s+[^,\n)]*",
+            f"{col} {definition}",
+            create_sql,
+            count=1,
+        )
+        if not n:
+            raise RuntimeError(f"papers.{col} not found in schema")
+    create_sql = re.sub(r"CREATE TABLE\s+(IF NOT EXISTS\s+)?\"?papers\"?", "CREATE TABLE papers_new", create_sql, count=1)
+
+    cols = [row[1] for row in conn.execute("PRAGMA table_info(papers)")]
+    exprs = ", ".join(select_exprs.get(c, c) for c in cols)
+    conn.execute(create_sql)
+    conn.execute(f"INSERT INTO papers_new ({', '.join(cols)}) SELECT {exprs} FROM papers")
+    conn.execute("DROP TABLE papers")
+    conn.execute("ALTER TABLE papers_new RENAME TO papers")
+
+
+def _migrate_epoch_columns(conn: sqlite3.Connection) -> None:
+    types = _column_types(conn)
+    pending = [c for c in EPOCH_COLUMNS if c in types and types[c] != "INTEGER"]
+    if not pending:
+        return
+    # ISO strings become epochs; digit-only strings were already written as epochs
+    select_exprs = {
+        c: (
+            f"CASE WHEN {c} IS NULL OR {c} = '' THEN NULL "
+            f"WHEN {c} NOT GLOB '*[^0-9]*' THEN CAST({c} AS INTEGER) "
+            f"ELSE CAST(strftime('%s', {c}) AS INTEGER) END"
+        )
+        for c in pending
+    }
+    _rebuild_papers(conn, {c: "INTEGER" for c in pending}, select_exprs)
+    print(f"✓ Migrated {', '.join(pending)} to INTEGER epochs")
+
+
+# Filter/sort columns get real defaults so queries compare the bare column
+# (a COALESCE() around it would keep the planner off the indexes)
+NOT_NULL_DEFAULTS = {
+    "excitement_score": ("INTEGER", "0"),
+    "reasoning_category": ("TEXT", "''"),
+    "tldr": ("TEXT", "''"),
+    "summary_md": ("TEXT", "''"),
+}
+
+
+def _migrate_not_null_defaults(conn: sqlite3.Connection) -> None:
+    notnull = {row[1]: row[3] for row in conn.execute("PRAGMA table_info(papers)")}
+    pending = [c for c in NOT_NULL_DEFAULTS if c in notnull and not notnull[c]]
+    if not pending:
+        return
+    column_defs = {
+        c: f"{NOT_NULL_DEFAULTS[c][0]} NOT NULL DEFAULT {NOT_NULL_DEFAULTS[c][1]}" for c in pending
+    }
+    select_exprs = {c: f"COALESCE({c}, {NOT_NULL_DEFAULTS[c][1]})" for c in pending}
+    # Blank arXiv ids become NULL so they never collide on the UNIQUE constraint
+    select_exprs["arxiv_id"] = "NULLIF(TRIM(arxiv_id), '')"
+    _rebuild_papers(conn, column_defs, select_exprs)
+    print(f"✓ Migrated {', '.join(pending)} to NOT NULL with defaults")
+
+
+# Filter flags derived from other columns. VIRTUAL because ALTER TABLE cannot
+# add STORED columns; the index on each flag stores the computed value.
+GENERATED_COLUMNS = {
+    "has_tldr": "INTEGER GENERATED ALWAYS AS (tldr <> '') VIRTUAL",
+}
+
+
+def _ensure_generated_columns(conn: sqlite3.Connection) -> None:
+    # table_info hides generated columns, table_xinfo lists them
+    existing = {row[1] for row in conn.execute("PRAGMA table_xinfo(papers)")}
+    for col, definition in GENERATED_COLUMNS.items():
+        if col in existing:
+            continue
+        try:
+            conn.execute(f"ALTER TABLE papers ADD COLUMN {col} {definition}")
+        except sqlite3.OperationalError as exc:
+            if "duplicate column" not in str(exc):
+                raise
+            continue
+        print(f"✓ Added generated column papers.{col}")
+
+
+# The apps run ensure_schema at startup, often alongside each other and the pipeline
+SCHEMA_LOCK_ATTEMPTS = 6
+
+
+def _begin_immediate(conn: sqlite3.Connection) -> None:
+    """Take the write lock, retrying past the connection's busy timeout while another process migrates."""
+    for attempt in range(SCHEMA_LOCK_ATTEMPTS):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as exc:
+            if "locked" not in str(exc) or attempt == SCHEMA_LOCK_ATTEMPTS - 1:
+                raise
+            time.sleep(1 + attempt)
+
+
+def ensure_schema(conn: sqlite3.Connection) -> bool:
+    """
+    Run pending migrations on papers, then (re)create indexes and the FTS
+    index. Returns whether FTS5 search is available.
+
+    Everything runs in one write transaction and each step decides what is
+    pending only after the lock is held, so concurrent callers never act on
+    a schema another process has since changed.
+    """
+    if not table_exists(conn, "papers"):
+        return False
+    _begin_immediate(conn)
+    try:
+        ensure_llm_cache(conn)
+        _ensure_base_columns(conn)
+        _migrate_epoch_columns(conn)
+        _migrate_not_null_defaults(conn)
+        _ensure_generated_columns(conn)
+        ensure_indexes(conn)
+        fts = ensure_fts(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return fts
+
+
+def init_db(path: str) -> bool:
+    """Migrate the schema and build indexes + the FTS5 search index; False means search uses LIKE."""
+    if not os.path.exists(path):
+        return False
+    conn = connect(path)
+    try:
+        return ensure_schema(conn)
+    finally:
+        conn.close()
+
+
+# Card rows for the web apps: PAPER_SELECT returns plain tuples in PAPER_COLS order
+PAPER_COLS = (
+    "id", "arxiv_id", "title", "authors", "date", "reasoning_category", "arxiv_link", "tldr",
+    "summary_md", "excitement_score", "excitement_reasoning", "score_breakdown", "last_scored_at",
+)
+PAPER_SELECT = """
+    SELECT
+      id,
+      COALESCE(arxiv_id, '') AS arxiv_id,
+      title,
+      authors,
+      date,
+      reasoning_category,
+      arxiv_link,
+      tldr,
+      summary_md,
+      excitement_score,
+      COALESCE(excitement_reasoning, '') AS excitement_reasoning,
+      COALESCE(score_breakdown, '') AS score_breakdown,
+      COALESCE(last_scored_at, '') AS last_scored_at
+"""
+
+
+def ensure_llm_cache(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key BLOB PRIMARY KEY,
+            response TEXT,
+            model TEXT,
+            tokens INT,
+            created_at INT
+        )
+    """)
+
+
+def llm_cache_key(model: str, *parts: str) -> bytes:
+    """Content hash of model + prompt inputs; any prompt or input change is a new key."""
+    return hashlib.sha256("\x1f".join((model, *parts)).encode()).digest()
+
+
+def llm_cache_get(conn: sqlite3.Connection, key: bytes):
+    row = conn.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def llm_cache_row(key: bytes, response: dict) -> tuple:
+    """Parameters for LLM_CACHE_PUT_SQL, so callers can batch the writes."""
+    return (key, json.dumps(response), response.get("model"), response.get("tokens"), int(time.time()))
+
+
+LLM_CACHE_PUT_SQL = """
+    INSERT OR REPLACE INTO llm_cache (key, response, model, tokens, created_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
@@ -1,4 +1,5 @@
 import os
+import re
 
 import requests
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
@@ -8,6 +9,7 @@ OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-latest")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+SUMMARY_MODEL = {"openai": OPENAI_MODEL, "anthropic": ANTHROPIC_MODEL, "ollama": OLLAMA_MODEL}.get(PROVIDER, PROVIDER)
 
 # Import OpenAI error types at module scope (safe even if provider != openai)
 try:
@@ -72,13 +74,67 @@ def call_llm(prompt: str):
         raise RuntimeError(f"Unknown SUMMARY_PROVIDER: {PROVIDER}")
 
 
-def triage_paper(title: str, abstract: str) -> dict:
+PREFILTER_MODEL = "keyword-prefilter"
+TRIAGE_FALLBACK_MODEL = "gpt-4o-mini (fallback)"
+
+# Compiled once; clear-cut papers are settled locally and only the ambiguous ones reach the LLM
+_POSITIVE_RE = re.compile(
+    r"\b(reasoning|chain[- ]of[- ]thoughts?|tree[- ]of[- ]thoughts?|agents?|agentic|planning|planner"
+    r"|tool[- ]use|tool[- ]calling|rlhf|self[- ]refine|self[- ]reflection|multi[- ]step"
+    r"|problem[- ]solving|theorem proving|test[- ]time (?:compute|scaling)|process reward)\b",
+    re.IGNORECASE,
+)
+_NEGATIVE_RE = re.compile(
+    r"\b(diffusion|image segmentation|semantic segmentation|object detection|image generation"
+    r"|video generation|super[- ]resolution|text[- ]to[- ]speech|point clouds?|asic|fpga"
+    r"|gpu kernels?|hardware accelerators?)\b",
+    re.IGNORECASE,
+)
+# Variants of one concept count as a single keyword hit
+_KEYWORD_LEMMAS = {
+    "agentic": "agent",
+    "planner": "planning",
+    "tool calling": "tool use",
+    "test time scaling": "test time compute",
+    "self reflection": "self refine",
+}
+
+
+def _canonical_keywords(regex, text: str) -> set:
+    keywords = set()
+    for m in regex.findall(text):
+        term = m.lower().replace("-", " ")
+        if term.endswith("s"):  # every plural in the lists is a plain trailing "s"
+            term = term[:-1]
+        keywords.add(_KEYWORD_LEMMAS.get(term, term))
+    return keywords
+
+
+def prefilter_paper(title: str, abstract: str):
     """
-    Stage A: Quick triage using Gemini Flash to determine if paper is worth full summary.
-    Returns: {"relevant": bool, "reason": str, "model": str, "tokens": int}
+    Stage 0: keyword prefilter. Returns a triage result for clear accepts/rejects,
+    or None when the paper is ambiguous and needs the LLM.
     """
+    text = f"{title}\n{abstract}"
+    pos = _canonical_keywords(_POSITIVE_RE, text)
+    neg = _canonical_keywords(_NEGATIVE_RE, text)
+
+    if len(pos) >= 2 and not neg:
+        relevant, hits = True, pos
+    elif len(neg) >= 2 and not pos:
+        relevant, hits = False, neg
+    else:
+        return None
 
-    prompt = f"""
+    return {
+        "relevant": relevant,
+        "reason": f"Keyword prefilter matched: {', '.join(sorted(hits))}",
+        "model": PREFILTER_MODEL,
+        "tokens": 0,
+    }
+
+
+TRIAGE_PROMPT = """
 You are filtering AI research papers for a reasoning-focused research hub.
 
 Determine if this paper is relevant to AI reasoning, agents, planning, or problem-solving.
@@ -107,6 +163,18 @@ Mark NO if it's primarily about:
 Be slightly permissive—err on the side of YES if uncertainty is high (we can down-score later).
 """.strip()
 
+
+def triage_paper(title: str, abstract: str) -> dict:
+    """
+    Stage A: Quick triage using Gemini Flash to determine if paper is worth full summary.
+    Returns: {"relevant": bool, "reason": str, "model": str, "tokens": int}
+    """
+    prefiltered = prefilter_paper(title, abstract)
+    if prefiltered is not None:
+        return prefiltered
+
+    prompt = TRIAGE_PROMPT.format(title=title, abstract=abstract)
+
     try:
         import google.generativeai as genai
 
@@ -176,7 +244,7 @@ Be slightly permissive—err on the side of YES if uncertainty is high.
         max_tokens=100,
     )
 
-    text = resp.choices[0].message.content
+    text = resp.choices[0].message.content or ""
     relevant = "RELEVANT: YES" in text.upper()
     reason_line = [line for line in text.split("\n") if "REASON:" in line.upper()]
     reason = reason_line[0].split(":", 1)[1].strip() if reason_line else text
@@ -184,6 +252,6 @@ Be slightly permissive—err on the side of YES if uncertainty is high.
     return {
         "relevant": relevant,
         "reason": reason,
-        "model": "gpt-4o-mini (fallback)",
+        "model": TRIAGE_FALLBACK_MODEL,
         "tokens": resp.usage.total_tokens if resp.usage else 0  # Track fallback cost
     }
@@ -41,6 +41,10 @@ def reset_database():
     
     try:
         os.remove(DB_PATH)
+        # WAL mode leaves sidecar files that must not outlive the main DB
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(DB_PATH + suffix):
+                os.remove(DB_PATH + suffix)
         print("✅ Database deleted.")
         
         # Re-initialize by connecting (sqlite3 creates file)
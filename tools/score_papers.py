@@ -1,5 +1,6 @@
 # tools/score_papers.py
-import os, sqlite3, datetime, time, random, re, json, argparse, math
+import os, time, random, re, json, argparse, math
+from db import connect, ensure_schema, sqlite3
 from llm_summary import call_llm
 
 DB_PATH = os.getenv("PROJECTS_DB", "data/papers.db")
@@ -80,23 +81,19 @@ def ensure_columns(conn: sqlite3.Connection) -> None:
     if "raw_excitement_score" not in columns:
         to_add.append("ALTER TABLE papers ADD COLUMN raw_excitement_score INTEGER DEFAULT 0")
     if "excitement_score" not in columns:
-        to_add.append("ALTER TABLE papers ADD COLUMN excitement_score INTEGER DEFAULT 0")
+        to_add.append("ALTER TABLE papers ADD COLUMN excitement_score INTEGER NOT NULL DEFAULT 0")
     if "excitement_reasoning" not in columns:
         to_add.append("ALTER TABLE papers ADD COLUMN excitement_reasoning TEXT")
     if "score_breakdown" not in columns:
         to_add.append("ALTER TABLE papers ADD COLUMN score_breakdown TEXT")
     if "last_scored_at" not in columns:
-        to_add.append("ALTER TABLE papers ADD COLUMN last_scored_at TEXT")
+        to_add.append("ALTER TABLE papers ADD COLUMN last_scored_at INTEGER")
     for sql in to_add:
         conn.execute(sql)
     if to_add:
         conn.commit()
         print("✓ Added excitement_* columns to papers")
 
-    # helpful index for filtering/sorting
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_ex_score ON papers(excitement_score)")
-    conn.commit()
-
 
 def parse_args() -> argparse.Namespace:
     ap = argparse.ArgumentParser(description="Score papers with an excitement metric (1–10).")
@@ -113,19 +110,19 @@ def select_rows(conn: sqlite3.Connection, ids, force: bool, limit: int):
     select_clause = """
         SELECT id,
                title,
-               COALESCE(tldr,'') AS tldr,
-               COALESCE(summary_md,'') AS summary_md,
+               tldr,
+               summary_md,
                reasoning_category
         FROM papers
     """
     if ids:
         placeholders = ",".join(["?"] * len(ids))
         # If not forcing, skip already-scored among requested IDs
-        filter_clause = "" if force else "AND COALESCE(excitement_score,0)=0"
+        filter_clause = "" if force else "AND excitement_score = 0"
         cur = conn.execute(f"""
             {select_clause}
             WHERE id IN ({placeholders})
-              AND summary_md IS NOT NULL AND summary_md <> ''
+              AND summary_md <> ''
               {filter_clause}
             ORDER BY id DESC
         """, ids)
@@ -133,15 +130,15 @@ def select_rows(conn: sqlite3.Connection, ids, force: bool, limit: int):
         if force:
             cur = conn.execute(f"""
                 {select_clause}
-                WHERE summary_md IS NOT NULL AND summary_md <> ''
+                WHERE summary_md <> ''
                 ORDER BY id DESC
                 LIMIT ?
             """, (limit,))
         else:
             cur = conn.execute(f"""
                 {select_clause}
-                WHERE summary_md IS NOT NULL AND summary_md <> ''
-                  AND COALESCE(excitement_score,0)=0
+                WHERE summary_md <> ''
+                  AND excitement_score = 0
                 ORDER BY id DESC
                 LIMIT ?
             """, (limit,))
@@ -246,7 +243,7 @@ def apply_rescaling(batch_results):
 
 
 def save_score(conn: sqlite3.Connection, pid: int, score: dict, raw_score: int, final_score: int) -> None:
-    now = datetime.datetime.utcnow().isoformat()
+    now = int(time.time())
     breakdown = f"Novelty:{score['novelty']}, Impact:{score['impact']}, Results:{score['results']}, Access:{score['accessibility']}"
     conn.execute("""
         UPDATE papers
@@ -257,14 +254,14 @@ def save_score(conn: sqlite3.Connection, pid: int, score: dict, raw_score: int,
             last_scored_at = ?
         WHERE id = ?
     """, (raw_score, final_score, score["reasoning"], breakdown, now, pid))
-    conn.commit()
 
 
 def main():
     args = parse_args()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     ensure_columns(conn)
+    ensure_schema(conn)
 
     rows = select_rows(conn, args.ids, args.force, args.limit)
     if not rows:
@@ -306,11 +303,14 @@ def main():
 
     apply_rescaling(scored_results)
 
+    # Single transaction for the whole batch: one fsync instead of one per paper
+    conn.execute("BEGIN")
     for item in scored_results:
         raw_score = item["raw_score"]
         final_score = item["rescaled_score"]
         save_score(conn, item["paper_id"], item["data"], raw_score, final_score)
         print(f"   Rescale [{item['paper_id']}]: raw = {raw_score} → rescaled = {final_score}\n")
+    conn.commit()
 
     conn.close()
 
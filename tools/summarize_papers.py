@@ -1,12 +1,45 @@
 import argparse
-import datetime
 import os
-import sqlite3
-
-from llm_summary import call_llm, triage_paper
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db import LLM_CACHE_PUT_SQL, connect, ensure_schema, llm_cache_get, llm_cache_key, llm_cache_row
+from llm_summary import (
+    GEMINI_MODEL,
+    PREFILTER_MODEL,
+    SUMMARY_MODEL,
+    TRIAGE_FALLBACK_MODEL,
+    TRIAGE_PROMPT,
+    call_llm,
+    triage_paper,
+)
 
 DB_PATH = os.getenv("PROJECTS_DB", "data/papers.db")
 BATCH_LIMIT = int(os.getenv("SUMMARY_BATCH", "10"))
+# LLM calls are network-bound, so overlap them; summaries are capped lower for provider rate limits
+TRIAGE_WORKERS = int(os.getenv("TRIAGE_WORKERS", "8"))
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+
+# Kept as constants so every write hits the same cached prepared statement
+SAVE_SUMMARY_SQL = """
+    UPDATE papers
+    SET summary_md = ?,
+        tldr = ?,
+        model_used = ?,
+        summary_tokens = ?,
+        last_summarized_at = ?
+    WHERE id = ?
+"""
+MARK_SKIPPED_SQL = "UPDATE papers SET summary_md = ?, tldr = ? WHERE id = ?"
+
+# TLDR = first non-blank, non-header line after a "The Big Idea" / "TL;DR" line;
+# otherwise the first non-blank, non-header line of the summary
+_TLDR_RE = re.compile(
+    r"^[^\n]*(?:the big idea|tl;?dr)[^\n]*\n(?:[ \t]*\n)*[ \t]*([^#\s][^\n]*)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_FIRST_LINE_RE = re.compile(r"^[ \t]*([^#\s][^\n]*)", re.MULTILINE)
 
 PROMPT_TEMPLATE = """
 You are a **Critical Technical Reviewer** for an AI research lab. Your audience consists of ML engineers and researchers who want deep technical insights, not marketing fluff.
@@ -79,8 +112,8 @@ def fetch_papers(conn, ids=None, force=False):
     base_query = """
         SELECT id, title, authors, abstract, arxiv_link AS url,
                COALESCE(notes, '') AS notes,
-               COALESCE(summary_md, '') AS summary_md,
-               COALESCE(tldr, '') AS tldr
+               summary_md,
+               tldr
         FROM papers
     """
 
@@ -93,8 +126,7 @@ def fetch_papers(conn, ids=None, force=False):
         cur = conn.execute(
             base_query
             + """
-            WHERE (summary_md IS NULL OR TRIM(summary_md) = '')
-               OR (tldr IS NULL OR TRIM(tldr) = '')
+            WHERE TRIM(summary_md) = '' OR TRIM(tldr) = ''
             ORDER BY id DESC
             LIMIT ?
             """,
@@ -115,43 +147,44 @@ def fetch_papers(conn, ids=None, force=False):
 
 
 def save_summary(conn, pid, summary_md, tldr, model, tokens):
-    now = datetime.datetime.utcnow().isoformat()
-    conn.execute(
-        """
-        UPDATE papers
-        SET summary_md = ?,
-            tldr = ?,
-            model_used = ?,
-            summary_tokens = ?,
-            last_summarized_at = ?
-        WHERE id = ?
-        """,
-        (summary_md, tldr, model, tokens, now, pid),
-    )
-    conn.commit()
+    now = int(time.time())
+    conn.execute(SAVE_SUMMARY_SQL, (summary_md, tldr, model, tokens, now, pid))
 
 
 def extract_tldr(markdown: str) -> str:
-    lines = [l.strip() for l in markdown.splitlines()]
-    for i, l in enumerate(lines):
-        low = l.lower().replace(";", "")
-        # Look for the new header format
-        if "the big idea" in low or "tldr" in low:
-            # next non-empty line is the TLDR
-            for j in range(i + 1, min(i + 6, len(lines))):
-                if lines[j] and not lines[j].startswith("#"):
-                    return lines[j]
+    m = _TLDR_RE.search(markdown)
+    if m:
+        return m.group(1).strip()
     # fallback: first non-empty line that isn't a header
-    for l in lines:
-        if l and not l.startswith("#"):
-            return l[:280]
-    return ""
+    m = _FIRST_LINE_RE.search(markdown)
+    return m.group(1).strip()[:280] if m else ""
+
+
+# Models whose triage answers are cached, in lookup order (prefilter results are free)
+TRIAGE_CACHE_MODELS = (GEMINI_MODEL, TRIAGE_FALLBACK_MODEL)
+
+
+def _triage_key(model, row):
+    return llm_cache_key(model, TRIAGE_PROMPT, row["title"], row["abstract"])
+
+
+def _cached_triage(conn, row):
+    for model in TRIAGE_CACHE_MODELS:
+        hit = llm_cache_get(conn, _triage_key(model, row))
+        if hit is not None:
+            return hit
+    return None
+
+
+def _non_empty(resp):
+    return resp if resp is not None and (resp.get("text") or "").strip() else None
 
 
 def main(argv=None):
     args = parse_args(argv)
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     try:
+        ensure_schema(conn)
         rows = fetch_papers(conn, ids=args.ids, force=args.force)
 
         if not rows:
@@ -165,66 +198,142 @@ def main(argv=None):
 
         triaged_count = 0
         skipped_count = 0
+        prefiltered_count = 0
         summarized_count = 0
         total_triage_tokens = 0
+        cache_hits = 0
+        summary_calls = 0
+        cache_rows = []
 
+        todo = []
         for row in rows:
-            pid = row["id"]
-            title = row["title"]
-            abstract = row["abstract"]
-
             existing_summary = row.get("summary_md", "")
             has_real_summary = existing_summary and "[Skipped" not in existing_summary
             if has_real_summary and not args.force:
-                print(f"⏭️  {pid}: Already summarized, skipping")
+                print(f"⏭️  {row['id']}: Already summarized, skipping")
                 continue
-
-            print(f"🔍 Triaging {pid}: {title[:60]}...")
-            try:
-                triage_result = triage_paper(title, abstract)
-                triaged_count += 1
-                total_triage_tokens += triage_result.get("tokens", 0) or 0
-
-                if not triage_result["relevant"]:
-                    print(f"   ⏭️  Skipped - Not relevant: {triage_result['reason']}")
-                    skipped_count += 1
-                    conn.execute(
-                        "UPDATE papers SET summary_md = ?, tldr = ? WHERE id = ?",
-                        ("[Skipped - Not relevant to reasoning]", triage_result["reason"], pid),
-                    )
-                    conn.commit()
-                    continue
-
-                print(f"   ✓ Relevant - {triage_result['reason'][:80]}")
-            except Exception as e:
-                print(f"   ⚠️  Triage failed: {e}, proceeding with full summary anyway")
-
-            prompt = PROMPT_TEMPLATE.format(**row)
-            try:
-                resp = call_llm(prompt)
-                md = (resp["text"] or "").strip()
-                violations = [p for p in ["novel approach", "promising results", "significant improvement"] if p in md.lower()]
-                if violations:
-                    print(f"⚠️  Paper {row['id']} boilerplate: {violations}")
-                tldr = extract_tldr(md)
-                save_summary(conn, pid, md, tldr, resp.get("model"), resp.get("tokens"))
-                summarized_count += 1
-                print(f"   ✅ Summarized ({len(md)} chars)\n")
-            except Exception as e:
-                print(f"   ❌ Summary failed: {e}\n")
+            todo.append(row)
+
+        # Stage A: triage the whole batch concurrently
+        skipped_rows = []
+        to_summarize = []
+        with ThreadPoolExecutor(max_workers=TRIAGE_WORKERS) as pool:
+            # Identical content never goes to the LLM twice (e.g. on --force reruns),
+            # whether Gemini or the OpenAI fallback answered it
+            cached = [_cached_triage(conn, row) for row in todo]
+            futures = [
+                None if hit is not None else pool.submit(triage_paper, row["title"], row["abstract"])
+                for row, hit in zip(todo, cached)
+            ]
+            for row, hit, fut in zip(todo, cached, futures):
+                pid = row["id"]
+                print(f"🔍 Triaged {pid}: {row['title'][:60]}...")
+                try:
+                    if hit is not None:
+                        triage_result = hit
+                        cache_hits += 1
+                    else:
+                        triage_result = fut.result()
+                        # Each answer is stored under the model that actually gave it
+                        model = triage_result.get("model")
+                        if model in TRIAGE_CACHE_MODELS:
+                            cache_rows.append(llm_cache_row(_triage_key(model, row), triage_result))
+                        total_triage_tokens += triage_result.get("tokens", 0) or 0
+                    # The reason is written to tldr, which is NOT NULL
+                    triage_result["reason"] = triage_result.get("reason") or ""
+                    triaged_count += 1
+                    if triage_result.get("model") == PREFILTER_MODEL:
+                        prefiltered_count += 1
+
+                    if not triage_result["relevant"]:
+                        print(f"   ⏭️  Skipped - Not relevant: {triage_result['reason']}")
+                        skipped_count += 1
+                        skipped_rows.append(
+                            ("[Skipped - Not relevant to reasoning]", triage_result["reason"], pid)
+                        )
+                        continue
+
+                    print(f"   ✓ Relevant - {triage_result['reason'][:80]}")
+                except Exception as e:
+                    print(f"   ⚠️  Triage failed: {e}, proceeding with full summary anyway")
+                to_summarize.append(row)
+
+        # Stage B: full summaries for the papers that passed triage
+        summaries = []
+        if to_summarize:
+            print(f"\n📝 Summarizing {len(to_summarize)} paper(s)...\n")
+        with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as pool:
+            prompts = [PROMPT_TEMPLATE.format(**row) for row in to_summarize]
+            keys = [llm_cache_key(SUMMARY_MODEL, prompt) for prompt in prompts]
+            # Older runs may have cached an empty response; treat those as misses
+            cached = [_non_empty(llm_cache_get(conn, key)) for key in keys]
+            futures = [
+                None if hit is not None else pool.submit(call_llm, prompt)
+                for prompt, hit in zip(prompts, cached)
+            ]
+            for row, key, hit, fut in zip(to_summarize, keys, cached, futures):
+                pid = row["id"]
+                try:
+                    if hit is not None:
+                        resp = hit
+                        cache_hits += 1
+                    else:
+                        resp = fut.result()
+                        summary_calls += 1
+                    md = (resp["text"] or "").strip()
+                    # An empty response is neither cached nor saved over the current summary
+                    if not md:
+                        raise ValueError("empty response")
+                    if hit is None:
+                        cache_rows.append(llm_cache_row(key, resp))
+                    tldr = extract_tldr(md)
+                    model, tokens = resp.get("model"), resp.get("tokens")
+                    violations = [p for p in ["novel approach", "promising results", "significant improvement"] if p in md.lower()]
+                    if violations:
+                        print(f"⚠️  Paper {pid} boilerplate: {violations}")
+                    summaries.append((pid, md, tldr or "", model, tokens))
+                    summarized_count += 1
+                    print(f"   ✅ {pid}: Summarized ({len(md)} chars)")
+                except Exception as e:
+                    print(f"   ❌ {pid}: Summary failed: {e}")
+
+        # Cache rows are committed on their own first, so a failed write
+        # below never makes a rerun pay for the same LLM calls again
+        try:
+            conn.execute("BEGIN")
+            conn.executemany(LLM_CACHE_PUT_SQL, cache_rows)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️  Failed to cache LLM responses: {e}")
+
+        # Write every result in one transaction
+        try:
+            conn.execute("BEGIN")
+            conn.executemany(MARK_SKIPPED_SQL, skipped_rows)
+            for pid, md, tldr, model, tokens in summaries:
+                save_summary(conn, pid, md, tldr, model, tokens)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Failed to save results, nothing was written (LLM responses are cached): {e}")
+            skipped_count = summarized_count = 0
 
         print("\n" + "=" * 60)
         print("📊 Pipeline Summary:")
         print(f"   Papers triaged: {triaged_count}")
+        print(f"   Resolved by keyword prefilter: {prefiltered_count}")
+        print(f"   LLM cache hits: {cache_hits}")
         print(f"   Skipped (not relevant): {skipped_count}")
         print(f"   Summarized: {summarized_count}")
         if triaged_count > 0:
             pass_rate = summarized_count / triaged_count * 100
             print(f"   Pass rate: {pass_rate:.1f}%")
         print(f"   Triage tokens used: {total_triage_tokens}")
-        if summarized_count > 0:
+        # Spend covers actual LLM calls only; cache hits are free
+        if summary_calls > 0 or total_triage_tokens > 0:
             triage_cost = total_triage_tokens / 1_000_000 * 0.15  # gpt-4.1-mini fallback
-            summary_cost = summarized_count * 0.04  # rough estimate
+            summary_cost = summary_calls * 0.04  # rough estimate
             total_cost = triage_cost + summary_cost
             print(f"   Estimated cost: ${total_cost:.2f}")
         print("=" * 60)